@@ -5,20 +5,119 @@ Tests which parameters are available for the nowcast-v1-15min-1km model
 Rate limit: 150 requests per hour (24 seconds between requests to be safe)
 """
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+import re
+import threading
 import time
-import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Set
+from typing import List, Set, Tuple
+
+# Parameter candidates following the short code pattern (t2m, rr, td).
+# Only short codes (2-4 characters) are kept. The list is constant, so it is
+# built once at import.
+_CANDIDATE_PARAMS: Tuple[str, ...] = tuple(sorted({
+    param for param in (
+        # Known working parameters
+        't2m', 'rr', 'td',
+        # Temperature
+        't2m',  # 2m temperature (confirmed)
+        'tt',   # temperature
+        'tx',   # maximum temperature
+        'tn',   # minimum temperature
+        'ts',   # surface temperature
+        # Precipitation
+        'rr',   # precipitation sum (confirmed)
+        'tp',   # total precipitation
+        'pr',   # precipitation rate
+        'rs',   # precipitation solid
+        'rl',   # precipitation liquid
+        # Dew point
+        'td',   # dew point (confirmed)
+        'd2m',  # 2m dew point
+        'dp',   # dew point
+        # Wind
+        'ff',   # wind speed
+        'dd',   # wind direction
+        'fx',   # wind gust / maximum wind speed
+        'u10',  # u-component 10m wind
+        'v10',  # v-component 10m wind
+        'ws',   # wind speed
+        'wd',   # wind direction
+        'wg',   # wind gust
+        # Humidity
+        'rh',   # relative humidity
+        'rf',   # relative feuchte
+        'hh',   # humidity
+        'hu',   # humidity
+        # Pressure
+        'sp',   # surface pressure
+        'pp',   # pressure
+        'ps',   # surface pressure
+        'pm',   # mean sea level pressure
+        'sl',   # sea level pressure
+        'msl',  # mean sea level
+        # Clouds
+        'cc',   # cloud cover
+        'cl',   # clouds
+        'n',    # cloud amount (German: Bewölkung)
+        'nh',   # high clouds
+        'nm',   # medium clouds
+        'nl',   # low clouds
+        # Visibility
+        'vv',   # visibility
+        'vis',  # visibility
+        'si',   # sicht (German for visibility)
+        # Radiation
+        'gs',   # global solar radiation
+        'sd',   # sunshine duration
+        'uv',   # UV index
+        'sw',   # shortwave radiation
+        'lw',   # longwave radiation
+        # Additional short weather codes
+        'sf',   # snowfall
+        'sn',   # snow
+        'hs',   # snow height
+        'ev',   # evaporation
+        'et',   # evapotranspiration
+    )
+    if 2 <= len(param) <= 4
+}))
+
 
 class GeosphereParameterTester:
+    __slots__ = (
+        'base_url', 'test_location', 'rate_limit_delay', 'max_workers',
+        '_rate_lock', '_next_request_at', '_request_spacing',
+        'valid_params', 'invalid_params', 'tested_params', '_local',
+    )
+
     def __init__(self):
         self.base_url = "https://dataset.api.hub.geosphere.at/v1/timeseries/forecast/nowcast-v1-15min-1km"
         self.test_location = "48.133029,16.4277403"  # Vienna coordinates
         self.rate_limit_delay = 5  # 25 seconds between requests (safe margin)
+        self.max_workers = 4  # individual probes in flight at once
+        self._rate_lock = threading.Lock()
+        self._next_request_at = 0.0
+        self._request_spacing = self.rate_limit_delay  # adapted from response headers
         self.valid_params = set()
         self.invalid_params = set()
         self.tested_params = set()
+        # Sessions aren't documented as thread-safe, so each probe thread
+        # keeps its own keep-alive connection
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """This thread's session, created on first use"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._local.session = session
+        return session
 
     def test_parameter(self, param: str) -> bool:
         """Test if a single parameter is valid"""
@@ -26,12 +125,13 @@ class GeosphereParameterTester:
 
         try:
             print(f"Testing parameter: {param}")
-            response = requests.get(url, timeout=30)
+            response = self.session.get(url, timeout=30)
+            self._update_rate_limit(response)
 
             if response.status_code == 200:
-                data = response.json()
+                parameters = self._get_parameters(orjson.loads(response.content))
                 # Check if parameter data is actually returned
-                if self._has_parameter_data(data, param):
+                if self._has_parameter_data(parameters, param):
                     print(f"✅ VALID: {param}")
                     self.valid_params.add(param)
                     return True
@@ -48,182 +148,169 @@ class GeosphereParameterTester:
                 print(f"⚠️  ERROR: {param} - HTTP {response.status_code}")
                 return False
 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             print(f"⚠️  ERROR: {param} - {str(e)}")
             return False
         finally:
             self.tested_params.add(param)
 
-    def _has_parameter_data(self, data: dict, param: str) -> bool:
-        """Check if the response contains actual data for the parameter"""
+    def test_parameters_batch(self, params: List[str]) -> bool:
+        """Test all parameters in a single comma-separated request
+
+        Returns False when the batch could not be evaluated and the caller
+        has to fall back to testing parameters one by one.
+        """
+        remaining = list(params)
+        while remaining:
+            self._wait_for_request_slot()
+            print(f"🔍 Testing {len(remaining)} parameters in a single request...")
+            try:
+                response = self.session.get(
+                    self.base_url,
+                    params={"parameters": ",".join(remaining), "lat_lon": self.test_location},
+                    timeout=30,
+                )
+                self._update_rate_limit(response)
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️  Batch request error: {str(e)}")
+                return False
+
+            if response.status_code == 200:
+                try:
+                    parameters = self._get_parameters(orjson.loads(response.content))
+                except orjson.JSONDecodeError as e:
+                    print(f"⚠️  Batch response is not valid JSON: {str(e)}")
+                    return False
+                for param in remaining:
+                    if self._has_parameter_data(parameters, param):
+                        print(f"✅ VALID: {param}")
+                        self.valid_params.add(param)
+                    else:
+                        print(f"❌ INVALID: {param} (no data returned)")
+                        self.invalid_params.add(param)
+                    self.tested_params.add(param)
+                return True
+            elif response.status_code == 422:
+                # Validation error - drop the codes named in the error body
+                # and retry the rest in one request
+                rejected = self._parse_rejected(response.text, remaining)
+                if not rejected:
+                    print("⚠️  Batch rejected without naming the invalid parameters")
+                    return False
+                for param in rejected:
+                    print(f"❌ INVALID: {param} (validation error)")
+                    self.invalid_params.add(param)
+                    self.tested_params.add(param)
+                remaining = [param for param in remaining if param not in rejected]
+            else:
+                print(f"⚠️  Batch request failed with status {response.status_code}")
+                return False
+        return True
+
+    @staticmethod
+    def _parse_rejected(error_body: str, params: List[str]) -> Set[str]:
+        """Find the parameters a 422 error body complains about"""
+        rejected = {
+            param for param in params
+            if re.search(rf"[\"']{re.escape(param)}[\"']", error_body)
+        }
+        # An error echoing the whole request names nothing specific
+        if len(params) > 1 and len(rejected) == len(params):
+            return set()
+        return rejected
+
+    @staticmethod
+    def _get_parameters(data: dict) -> dict:
+        """Extract the parameters dict of the first feature of a response"""
         try:
             if 'features' in data and len(data['features']) > 0:
                 properties = data['features'][0].get('properties', {})
-                parameters = properties.get('parameters', {})
-                return param in parameters and parameters[param].get('data') is not None
-            return False
-        except (KeyError, IndexError, TypeError):
-            return False
-
-    def test_all_first_request(self) -> Set[str]:
-        """Make initial request without parameter filter to see all available params"""
-        url = f"{self.base_url}?lat_lon={self.test_location}"
+                return properties.get('parameters', {}) or {}
+            return {}
+        except (KeyError, IndexError, TypeError, AttributeError):
+            return {}
+
+    def _paced_test_parameter(self, param: str) -> bool:
+        """Test a parameter once its rate-limit slot comes up"""
+        self._wait_for_request_slot()
+        return self.test_parameter(param)
+
+    def _wait_for_request_slot(self):
+        """Block until the next request may start; requests in flight may overlap"""
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + self._request_spacing
+        if wait > 0:
+            print(f"⏳ Waiting {wait:.0f}s for rate limit...")
+            time.sleep(wait)
+
+    def _update_rate_limit(self, response: requests.Response):
+        """Adapt request spacing to the quota reported in the response headers
+
+        Requests go back-to-back while quota remains and pause until the
+        window resets when it runs out. Without rate-limit headers the fixed
+        rate_limit_delay applies.
+        """
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        if remaining is None:
+            with self._rate_lock:
+                self._request_spacing = self.rate_limit_delay
+            return
 
         try:
-            print("🔍 Making initial request to discover all parameters...")
-            response = requests.get(url, timeout=30)
+            remaining = int(remaining)
+            reset = float(response.headers.get("X-RateLimit-Reset", "0"))
+        except ValueError:
+            return
+        # Reset is either an epoch timestamp or a number of seconds
+        reset_in = reset - time.time() if reset > 1e9 else reset
 
-            if response.status_code == 200:
-                data = response.json()
-                if 'features' in data and len(data['features']) > 0:
-                    properties = data['features'][0].get('properties', {})
-                    parameters = properties.get('parameters', {})
-                    discovered_params = set(parameters.keys())
-                    print(f"📋 Discovered parameters from full request: {sorted(discovered_params)}")
-                    return discovered_params
-                else:
-                    print("⚠️  No features found in response")
+        with self._rate_lock:
+            if remaining > 1:
+                self._request_spacing = 0
+                self._next_request_at = min(self._next_request_at, time.monotonic())
             else:
-                print(f"⚠️  Initial request failed with status {response.status_code}")
-
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️  Initial request error: {str(e)}")
-
-        return set()
-
-    def get_parameter_candidates(self) -> List[str]:
-        """Get list of parameter candidates following the short code pattern (t2m, rr, td)"""
-        # Known working parameters
-        known_valid = ['t2m', 'rr', 'td']
-
-        # Short meteorological parameter codes (2-3 characters)
-        # Following the pattern observed: t2m, rr, td
-        temperature_params = [
-            't2m',  # 2m temperature (confirmed)
-            'tt',   # temperature
-            'tx',   # maximum temperature
-            'tn',   # minimum temperature
-            'ts',   # surface temperature
-        ]
-
-        precipitation_params = [
-            'rr',   # precipitation sum (confirmed)
-            'tp',   # total precipitation
-            'pr',   # precipitation rate
-            'rs',   # precipitation solid
-            'rl',   # precipitation liquid
-        ]
-
-        dewpoint_params = [
-            'td',   # dew point (confirmed)
-            'd2m',  # 2m dew point
-            'dp',   # dew point
-        ]
-
-        wind_params = [
-            'ff',   # wind speed
-            'dd',   # wind direction
-            'fx',   # wind gust / maximum wind speed
-            'u10',  # u-component 10m wind
-            'v10',  # v-component 10m wind
-            'ws',   # wind speed
-            'wd',   # wind direction
-            'wg',   # wind gust
-        ]
-
-        humidity_params = [
-            'rh',   # relative humidity
-            'rf',   # relative feuchte
-            'hh',   # humidity
-            'hu',   # humidity
-        ]
-
-        pressure_params = [
-            'sp',   # surface pressure
-            'pp',   # pressure
-            'ps',   # surface pressure
-            'pm',   # mean sea level pressure
-            'sl',   # sea level pressure
-            'msl',  # mean sea level
-        ]
-
-        cloud_params = [
-            'cc',   # cloud cover
-            'cl',   # clouds
-            'n',    # cloud amount (German: Bewölkung)
-            'nh',   # high clouds
-            'nm',   # medium clouds
-            'nl',   # low clouds
-        ]
-
-        visibility_params = [
-            'vv',   # visibility
-            'vis',  # visibility
-            'si',   # sicht (German for visibility)
-        ]
-
-        radiation_params = [
-            'gs',   # global solar radiation
-            'sd',   # sunshine duration
-            'uv',   # UV index
-            'sw',   # shortwave radiation
-            'lw',   # longwave radiation
-        ]
-
-        # Additional short weather codes
-        other_params = [
-            'sf',   # snowfall
-            'sn',   # snow
-            'hs',   # snow height
-            'ev',   # evaporation
-            'et',   # evapotranspiration
-        ]
+                self._request_spacing = self.rate_limit_delay
+                self._next_request_at = max(self._next_request_at, time.monotonic() + max(0.0, reset_in))
 
-        all_candidates = (known_valid + temperature_params + precipitation_params +
-                          dewpoint_params + wind_params + humidity_params +
-                          pressure_params + cloud_params + visibility_params +
-                          radiation_params + other_params)
-
-        # Remove duplicates and filter to keep only short codes (2-4 chars)
-        unique_candidates = list(set(all_candidates))
-        short_codes = [param for param in unique_candidates if 2 <= len(param) <= 4]
+    def _has_parameter_data(self, parameters: dict, param: str) -> bool:
+        """Check if the parameters dict contains actual data for the parameter"""
+        try:
+            return param in parameters and parameters[param].get('data') is not None
+        except (AttributeError, TypeError):
+            return False
 
-        return sorted(short_codes)
+    def get_parameter_candidates(self) -> Tuple[str, ...]:
+        """Get parameter candidates following the short code pattern (t2m, rr, td)"""
+        return _CANDIDATE_PARAMS
 
     def run_discovery(self):
         """Run the parameter discovery process"""
         print("🚀 Starting Geosphere API Parameter Discovery")
-        print(f"⏱️  Rate limit: {self.rate_limit_delay}s between requests")
+        print(f"⏱️  Rate limit: from API headers, else {self.rate_limit_delay}s between requests")
         print(f"📍 Test location: {self.test_location}")
         print("=" * 60)
 
-        # First, try to get all parameters in one request
-        discovered_params = self.test_all_first_request()
-
-        if discovered_params:
-            print(f"\n✅ Found {len(discovered_params)} parameters from initial request!")
-            for param in sorted(discovered_params):
-                self.valid_params.add(param)
-            self.print_results()
-            return
-
-        # If that didn't work, test individual parameters
-        print("\n🔍 Initial discovery failed, testing individual parameters...")
+        # Test all candidates in one batched request
         candidates = self.get_parameter_candidates()
 
         print(f"📝 Testing {len(candidates)} short parameter codes (2-4 characters)")
         print(f"🎯 Following pattern: t2m, rr, td (known valid)")
-        print("⚠️  This will take approximately {:.1f} minutes".format(
-            len(candidates) * self.rate_limit_delay / 60))
 
-        for i, param in enumerate(candidates, 1):
-            print(f"\n[{i}/{len(candidates)}] ", end="")
-            self.test_parameter(param)
+        if self.test_parameters_batch(candidates):
+            self.print_results()
+            return
+
+        # Batch could not be evaluated, test the remaining parameters individually
+        candidates = [param for param in candidates if param not in self.tested_params]
+        print(f"\n🔍 Batch test failed, testing {len(candidates)} parameters individually...")
+        print("⚠️  This can take up to {:.1f} minutes".format(
+            len(candidates) * self.rate_limit_delay / 60))
 
-            # Rate limiting - wait between requests
-            if i < len(candidates):  # Don't wait after the last request
-                print(f"⏳ Waiting {self.rate_limit_delay}s for rate limit...")
-                time.sleep(self.rate_limit_delay)
+        # Probes overlap on the network; only their start times are paced
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self._paced_test_parameter, candidates))
 
         self.print_results()
 
@@ -248,8 +335,9 @@ class GeosphereParameterTester:
         print(f"   • Invalid: {len(self.invalid_params)}")
 
         # Save results to file
+        now = datetime.now()
         results = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'model': 'nowcast-v1-15min-1km',
             'test_location': self.test_location,
             'valid_parameters': sorted(list(self.valid_params)),
@@ -261,10 +349,10 @@ class GeosphereParameterTester:
             }
         }
 
-        filename = f"geosphere_parameters_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filename = f"geosphere_parameters_{now.strftime('%Y%m%d_%H%M%S')}.json"
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2, ensure_ascii=False)
+            with open(filename, 'wb') as f:
+                f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
             print(f"💾 Results saved to: {filename}")
         except Exception as e:
             print(f"⚠️  Could not save results: {e}")
@@ -4,20 +4,28 @@ Sources:
   - Open-Meteo forecast API (primary): current conditions, hourly and daily forecast
   - GeoSphere Austria nowcast (secondary): 3-hour / 15-minute high-resolution nowcast
 
-Raw API responses are stored under data/raw_*.json, processed frontend-ready
+Raw API responses are stored gzipped under data/raw_*.json.gz, processed frontend-ready
 files under data/processed_*.json and mirrored into the frontend public dir.
+The Open-Meteo hourly and daily forecasts are kept column-oriented (parallel
+arrays per field) as delivered by the API.
 """
 
 from __future__ import annotations
 
-import json
+import gzip
+import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import chain, repeat
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 # Location: Kledering (Vienna outskirts)
 LATITUDE = 48.133029
@@ -25,15 +33,70 @@ LONGITUDE = 16.4277403
 LOCATION_NAME = "Kledering"
 LOCAL_TZ = ZoneInfo("Europe/Vienna")
 
-REQUEST_TIMEOUT = 30  # seconds
-RETRIES = 3
-RETRY_BACKOFF = 5  # seconds between attempts
+REQUEST_TIMEOUT = (3, 30)  # connect, read seconds
+RETRIES = 3  # attempts per request, including the first
+RETRY_BACKOFF = 2.5  # urllib3 backoff factor: 0 s, then 5 s between attempts
+DECODE_RETRY_DELAY = 5  # seconds before re-requesting a body that isn't JSON
+# Local re-runs within this window reuse the raw dump instead of refetching.
+# Scheduled runs start from a fresh checkout without raw dumps, so they
+# always fetch.
+CACHE_TTL = 10 * 60  # seconds
 
 BACKEND_DIR = Path(__file__).resolve().parent
 DATA_DIR = BACKEND_DIR / "data"
 FRONTEND_DATA_DIR = BACKEND_DIR.parent / "frontend" / "public" / "backend" / "data"
 
 OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+# Frontend field name -> Open-Meteo variable, per block. The schema is fixed,
+# so these drive both the request and the processing.
+CURRENT_FIELDS = {
+    "temperature": "temperature_2m",
+    "feels_like": "apparent_temperature",
+    "humidity": "relative_humidity_2m",
+    "precipitation": "precipitation",
+    "weather_code": "weather_code",
+    "cloud_cover": "cloud_cover",
+    "pressure": "pressure_msl",
+    "wind_speed": "wind_speed_10m",
+    "wind_direction": "wind_direction_10m",
+    "wind_gusts": "wind_gusts_10m",
+    "is_day": "is_day",
+}
+HOURLY_FIELDS = {
+    "temperature": "temperature_2m",
+    "feels_like": "apparent_temperature",
+    "humidity": "relative_humidity_2m",
+    "precipitation_probability": "precipitation_probability",
+    "precipitation": "precipitation",
+    "weather_code": "weather_code",
+    "cloud_cover": "cloud_cover",
+    "visibility": "visibility",
+    "uv_index": "uv_index",
+    "pressure": "pressure_msl",
+    "wind_speed": "wind_speed_10m",
+    "wind_direction": "wind_direction_10m",
+    "wind_gusts": "wind_gusts_10m",
+    "is_day": "is_day",
+}
+DAILY_FIELDS = {
+    "weather_code": "weather_code",
+    "temperature_max": "temperature_2m_max",
+    "temperature_min": "temperature_2m_min",
+    "feels_like_max": "apparent_temperature_max",
+    "feels_like_min": "apparent_temperature_min",
+    "sunrise": "sunrise",
+    "sunset": "sunset",
+    "daylight_duration": "daylight_duration",
+    "sunshine_duration": "sunshine_duration",
+    "uv_index_max": "uv_index_max",
+    "precipitation_sum": "precipitation_sum",
+    "precipitation_probability_max": "precipitation_probability_max",
+    "wind_speed_max": "wind_speed_10m_max",
+    "wind_gusts_max": "wind_gusts_10m_max",
+    "wind_direction_dominant": "wind_direction_10m_dominant",
+}
+
 OPEN_METEO_PARAMS = {
     "latitude": LATITUDE,
     "longitude": LONGITUDE,
@@ -41,52 +104,9 @@ OPEN_METEO_PARAMS = {
     "past_days": 1,
     "forecast_days": 8,
     "models": "best_match",
-    "current": ",".join([
-        "temperature_2m",
-        "apparent_temperature",
-        "relative_humidity_2m",
-        "precipitation",
-        "weather_code",
-        "cloud_cover",
-        "pressure_msl",
-        "wind_speed_10m",
-        "wind_direction_10m",
-        "wind_gusts_10m",
-        "is_day",
-    ]),
-    "hourly": ",".join([
-        "temperature_2m",
-        "apparent_temperature",
-        "relative_humidity_2m",
-        "precipitation_probability",
-        "precipitation",
-        "weather_code",
-        "cloud_cover",
-        "visibility",
-        "uv_index",
-        "pressure_msl",
-        "wind_speed_10m",
-        "wind_direction_10m",
-        "wind_gusts_10m",
-        "is_day",
-    ]),
-    "daily": ",".join([
-        "weather_code",
-        "temperature_2m_max",
-        "temperature_2m_min",
-        "apparent_temperature_max",
-        "apparent_temperature_min",
-        "sunrise",
-        "sunset",
-        "daylight_duration",
-        "sunshine_duration",
-        "uv_index_max",
-        "precipitation_sum",
-        "precipitation_probability_max",
-        "wind_speed_10m_max",
-        "wind_gusts_10m_max",
-        "wind_direction_10m_dominant",
-    ]),
+    "current": ",".join(CURRENT_FIELDS.values()),
+    "hourly": ",".join(HOURLY_FIELDS.values()),
+    "daily": ",".join(DAILY_FIELDS.values()),
 }
 
 GEOSPHERE_URL = (
@@ -100,37 +120,61 @@ GEOSPHERE_PARAMS = {
 MS_TO_KMH = 3.6
 
 
-def fetch_json(url: str, params: dict) -> dict | None:
-    """GET a JSON resource with retries; return None on persistent failure."""
+def make_session() -> requests.Session:
+    """Session that keeps its connection alive across retries.
+
+    Sessions aren't documented as thread-safe, so each source gets its own.
+    """
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        max_retries=Retry(
+            total=RETRIES - 1,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=(429, 500, 502, 503, 504),
+        ),
+    ))
+    return session
+
+
+def fetch_json(session: requests.Session, url: str, params: dict) -> tuple[bytes, dict] | None:
+    """GET a JSON resource; the session retries connection errors and 5xx/429.
+
+    A 200 whose body isn't JSON (e.g. a proxy error page) is requested again
+    here, up to RETRIES attempts. Returns the response body as received
+    together with the parsed data, or None on persistent failure.
+    """
     for attempt in range(1, RETRIES + 1):
         try:
-            response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
-            return response.json()
+            return response.content, orjson.loads(response.content)
         except requests.exceptions.RequestException as exc:
-            print(f"  attempt {attempt}/{RETRIES} failed for {url}: {exc}")
+            # The adapter has already used up its retries
+            print(f"  request failed for {url}: {exc}")
+            return None
+        except orjson.JSONDecodeError as exc:
+            print(f"  attempt {attempt}/{RETRIES}: invalid JSON from {url}: {exc}")
             if attempt < RETRIES:
-                time.sleep(RETRY_BACKOFF)
+                time.sleep(DECODE_RETRY_DELAY)
     return None
 
 
-def columns_to_rows(block: dict, fields: dict[str, str], time_key: str = "time") -> list[dict]:
-    """Convert Open-Meteo's column-oriented block into a list of row dicts.
+def select_columns(block: dict, fields: dict[str, str], time_key: str = "time") -> dict[str, list]:
+    """Rename the columns of an Open-Meteo block to the frontend field names.
 
-    fields maps output name -> API column name. Missing columns yield None.
+    The output stays column-oriented (one list per field) so the data file
+    doesn't repeat every key per entry. fields maps output name -> API column
+    name; every column is padded with None to the length of the time column.
     """
-    times = block.get(time_key, [])
-    columns = {out: block.get(src, []) for out, src in fields.items()}
-    rows = []
-    for i, timestamp in enumerate(times):
-        row = {"time": timestamp}
-        for out, column in columns.items():
-            row[out] = column[i] if i < len(column) else None
-        rows.append(row)
-    return rows
-
-
-def process_open_meteo(data: dict) -> dict:
+    times = block.get(time_key) or []
+    columns = {"time": times}
+    for out, src in fields.items():
+        column = (block.get(src) or [])[:len(times)]
+        columns[out] = column + [None] * (len(times) - len(column))
+    return columns
+
+
+def process_open_meteo(data: dict, updated: datetime) -> dict:
     """Shape the raw Open-Meteo response into the frontend data model."""
     current = data.get("current", {})
     processed = {
@@ -142,7 +186,7 @@ def process_open_meteo(data: dict) -> dict:
             "timezone": data.get("timezone", "Europe/Vienna"),
         },
         "source": "Open-Meteo",
-        "last_updated": datetime.now(LOCAL_TZ).isoformat(),
+        "last_updated": updated.isoformat(),
         "units": {
             "temperature": "°C",
             "precipitation": "mm",
@@ -154,56 +198,15 @@ def process_open_meteo(data: dict) -> dict:
         },
         "current": {
             "time": current.get("time"),
-            "temperature": current.get("temperature_2m"),
-            "feels_like": current.get("apparent_temperature"),
-            "humidity": current.get("relative_humidity_2m"),
-            "precipitation": current.get("precipitation"),
-            "weather_code": current.get("weather_code"),
-            "cloud_cover": current.get("cloud_cover"),
-            "pressure": current.get("pressure_msl"),
-            "wind_speed": current.get("wind_speed_10m"),
-            "wind_direction": current.get("wind_direction_10m"),
-            "wind_gusts": current.get("wind_gusts_10m"),
-            "is_day": current.get("is_day"),
+            **{out: current.get(src) for out, src in CURRENT_FIELDS.items()},
         },
-        "hourly": columns_to_rows(data.get("hourly", {}), {
-            "temperature": "temperature_2m",
-            "feels_like": "apparent_temperature",
-            "humidity": "relative_humidity_2m",
-            "precipitation_probability": "precipitation_probability",
-            "precipitation": "precipitation",
-            "weather_code": "weather_code",
-            "cloud_cover": "cloud_cover",
-            "visibility": "visibility",
-            "uv_index": "uv_index",
-            "pressure": "pressure_msl",
-            "wind_speed": "wind_speed_10m",
-            "wind_direction": "wind_direction_10m",
-            "wind_gusts": "wind_gusts_10m",
-            "is_day": "is_day",
-        }),
-        "daily": columns_to_rows(data.get("daily", {}), {
-            "weather_code": "weather_code",
-            "temperature_max": "temperature_2m_max",
-            "temperature_min": "temperature_2m_min",
-            "feels_like_max": "apparent_temperature_max",
-            "feels_like_min": "apparent_temperature_min",
-            "sunrise": "sunrise",
-            "sunset": "sunset",
-            "daylight_duration": "daylight_duration",
-            "sunshine_duration": "sunshine_duration",
-            "uv_index_max": "uv_index_max",
-            "precipitation_sum": "precipitation_sum",
-            "precipitation_probability_max": "precipitation_probability_max",
-            "wind_speed_max": "wind_speed_10m_max",
-            "wind_gusts_max": "wind_gusts_10m_max",
-            "wind_direction_dominant": "wind_direction_10m_dominant",
-        }),
+        "hourly": select_columns(data.get("hourly", {}), HOURLY_FIELDS),
+        "daily": select_columns(data.get("daily", {}), DAILY_FIELDS),
     }
     return processed
 
 
-def process_geosphere(data: dict) -> dict | None:
+def process_geosphere(data: dict, updated: datetime) -> dict | None:
     """Shape the raw GeoSphere nowcast into the frontend data model.
 
     Wind values arrive in m/s and are converted to km/h so they compare
@@ -231,12 +234,10 @@ def process_geosphere(data: dict) -> dict | None:
         "wind_gusts": [kmh(v) for v in series("fx")],
     }
 
-    forecast = []
-    for i, timestamp in enumerate(timestamps):
-        row = {"time": timestamp}
-        for name, column in columns.items():
-            row[name] = column[i] if i < len(column) else None
-        forecast.append(row)
+    names = ("time", *columns)
+    # Pad every column with None so zip runs for the full length of timestamps
+    padded = [chain(column, repeat(None)) for column in columns.values()]
+    forecast = [dict(zip(names, values)) for values in zip(timestamps, *padded)]
 
     return {
         "location": {
@@ -248,7 +249,7 @@ def process_geosphere(data: dict) -> dict | None:
         "source": "GeoSphere Austria",
         "forecast_type": "nowcast",
         "resolution_minutes": 15,
-        "last_updated": datetime.now(LOCAL_TZ).isoformat(),
+        "last_updated": updated.isoformat(),
         "units": {
             # GeoSphere reports "degree_Celsius" / "kg m-2"; use display units
             # (1 kg/m² of rain = 1 mm)
@@ -263,29 +264,76 @@ def process_geosphere(data: dict) -> dict | None:
     }
 
 
+def load_cached_raw(path: Path) -> tuple[bytes, dict, datetime] | None:
+    """Return a raw dump younger than CACHE_TTL like fetch_json, else None.
+
+    The third item is when the dump was written, i.e. when its data was fetched.
+    """
+    try:
+        mtime = path.stat().st_mtime
+        if time.time() - mtime >= CACHE_TTL:
+            return None
+        with gzip.open(path, "rb") as f:
+            body = f.read()
+        return body, orjson.loads(body), datetime.fromtimestamp(mtime, LOCAL_TZ)
+    except (OSError, EOFError, orjson.JSONDecodeError):
+        return None
+
+
+def save_raw(body: bytes, path: Path) -> None:
+    """Dump an API response body as received, gzipped at the fastest level."""
+    with gzip.open(path, "wb", compresslevel=1) as f:
+        f.write(body)
+    print(f"  wrote {path.relative_to(BACKEND_DIR.parent)}")
+
+
+def temp_path(path: Path) -> Path:
+    """Scratch name next to path, so os.replace onto path stays atomic."""
+    return path.with_name(f"{path.name}.tmp.{os.getpid()}")
+
+
 def save_json(data: dict, path: Path, mirror_to_frontend: bool = False) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # Compact: these files are read by the frontend, not by people
+    payload = orjson.dumps(data)
+    # Write aside and swap in, so readers never see a truncated file
+    tmp = temp_path(path)
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
     print(f"  wrote {path.relative_to(BACKEND_DIR.parent)}")
     if mirror_to_frontend:
         mirror = FRONTEND_DATA_DIR / path.name
-        mirror.parent.mkdir(parents=True, exist_ok=True)
-        with open(mirror, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # Hard-link instead of writing the bytes a second time
+        tmp = temp_path(mirror)
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(path, tmp)
+        except OSError:  # e.g. separate filesystems
+            tmp.write_bytes(payload)
+        os.replace(tmp, mirror)
         print(f"  wrote {mirror.relative_to(BACKEND_DIR.parent)}")
 
 
-def run_source(name: str, url: str, params: dict, processor, output_stem: str) -> bool:
+def run_source(
+    name: str, url: str, params: dict, processor, output_stem: str, updated: datetime
+) -> bool:
     """Fetch, process and persist one data source. Returns True on success."""
     print(f"Fetching {name}...")
-    raw = fetch_json(url, params)
-    if raw is None:
-        print(f"  {name} unavailable")
-        return False
-
-    save_json(raw, DATA_DIR / f"raw_{output_stem}.json")
-    processed = processor(raw)
+    raw_path = DATA_DIR / f"raw_{output_stem}.json.gz"
+    cached = load_cached_raw(raw_path)
+    if cached is not None:
+        # Stamp the output with the original fetch time, not this run's
+        _, raw, updated = cached
+        print(f"  reusing {raw_path.relative_to(BACKEND_DIR.parent)} (fetched {updated:%H:%M:%S})")
+    else:
+        with make_session() as session:
+            response = fetch_json(session, url, params)
+        if response is None:
+            print(f"  {name} unavailable")
+            return False
+        body, raw = response
+        save_raw(body, raw_path)
+
+    processed = processor(raw, updated)
     if processed is None:
         return False
     save_json(processed, DATA_DIR / f"processed_{output_stem}.json", mirror_to_frontend=True)
@@ -293,26 +341,38 @@ def run_source(name: str, url: str, params: dict, processor, output_stem: str) -
 
 
 def main() -> int:
-    results = {
-        "Open-Meteo": run_source(
+    # One timestamp for everything fetched in this run (reused dumps keep their own)
+    updated = datetime.now(LOCAL_TZ)
+    # Created once here; the save helpers assume both exist
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    FRONTEND_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    sources = {
+        "Open-Meteo": (
             "Open-Meteo forecast", OPEN_METEO_URL, OPEN_METEO_PARAMS,
             process_open_meteo, "open_meteo",
         ),
-        "GeoSphere Austria": run_source(
+        "GeoSphere Austria": (
             "GeoSphere nowcast", GEOSPHERE_URL, GEOSPHERE_PARAMS,
             process_geosphere, "geosphere",
         ),
     }
+    # The sources are independent, so fetch them side by side
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+        futures = {
+            name: executor.submit(run_source, *args, updated) for name, args in sources.items()
+        }
+    results = {name: future.result() for name, future in futures.items()}
 
     metadata = {
-        "last_update": datetime.now(LOCAL_TZ).isoformat(),
+        "last_update": updated.isoformat(),
         "status": "success" if any(results.values()) else "error",
         "sources": [
             {"name": name, "status": "success" if ok else "error"}
             for name, ok in results.items()
         ],
     }
-    save_json(metadata, DATA_DIR / "processed_metadata.json", mirror_to_frontend=True)
+    # Run status for the repo only; the dashboard never requests it
+    save_json(metadata, DATA_DIR / "processed_metadata.json")
 
     if not any(results.values()):
         print("All sources failed.")
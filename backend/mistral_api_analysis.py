@@ -1,35 +1,47 @@
 """Generate an AI weather briefing for Kledering with Mistral.
 
 Fetches a one-day, high-resolution forecast from Open-Meteo, asks Mistral for
-a concise HTML briefing focused on outdoor-activity windows, translates it to
-German, and saves both languages for the frontend.
+a concise HTML briefing focused on outdoor-activity windows in English and
+German (one request, JSON mode), and saves both languages for the frontend.
+When the prompt is identical to the one behind the saved briefing, Mistral is
+not called again.
 
 The API key is read from the MISTRAL_API_KEY environment variable.
 """
 
 from __future__ import annotations
 
-import json
+import gzip
+import hashlib
 import os
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING
 from zoneinfo import ZoneInfo
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
-try:
-    # mistralai >= 2.0 moved the client class
-    from mistralai.client import Mistral
-except ImportError:
-    from mistralai import Mistral
+if TYPE_CHECKING:
+    try:
+        from mistralai.client import Mistral
+    except ImportError:
+        from mistralai import Mistral
 
 LOCAL_TZ = ZoneInfo("Europe/Vienna")
 MISTRAL_MODEL = os.environ.get("MISTRAL_MODEL", "mistral-small-latest")
-REQUEST_TIMEOUT = 30
+MISTRAL_TEMPERATURE = 0.2
+MISTRAL_MAX_TOKENS = 2048  # shared by both briefings
+REQUEST_TIMEOUT = (3, 30)  # connect, read seconds
+MISTRAL_TIMEOUT_MS = 120_000
+SNAPSHOT_TTL = 60 * 60  # seconds; Open-Meteo refreshes its forecast hourly
 
 BACKEND_DIR = Path(__file__).resolve().parent
-WEATHER_SNAPSHOT_PATH = BACKEND_DIR / "data" / "today_weather.json"
+WEATHER_SNAPSHOT_PATH = BACKEND_DIR / "data" / "today_weather.json.gz"
 ANALYSIS_PATH = (
     BACKEND_DIR.parent / "frontend" / "public" / "backend" / "data" / "weather_analysis.json"
 )
@@ -58,6 +70,17 @@ OPEN_METEO_PARAMS = {
     ]),
 }
 
+# Reused for the forecast fetch so retries share a kept-alive connection
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+    ),
+))
+
 ANALYSIS_PROMPT = """Generate a concise yet technical daily weather report based on the following forecast data for Kledering (Vienna, Austria):
 
 {weather_summary}
@@ -74,20 +97,22 @@ Guidelines:
         If the weather is unsuitable for outdoor sport, say so clearly.
 
     Formatting:
-        Respond with embeddable HTML only (headings, paragraphs, lists, bold where useful).
+        Write the report as embeddable HTML (headings, paragraphs, lists, bold where useful).
         Use semantic tags only - the host page does all styling. No <style> blocks,
         no style attributes, no colors, no fonts, no wrapper <div> with layout.
         No page-level headings like "Weather Report" - the report is embedded under its own title.
-        No markdown, no explanations outside the HTML.
+        No markdown.
+
+    Output:
+        Respond with a JSON object with exactly two string fields:
+        "english": the report in English,
+        "german": the same report translated to German.
+        The German HTML keeps every tag and attribute of the English one; translate only
+        the text content and do not change numbers, units or special characters like °C.
+        No explanations outside the JSON object.
 """
 
-TRANSLATION_PROMPT = """Translate the following English weather report to German.
-Keep every HTML tag and attribute exactly as it is; translate only the text content.
-Do not change numbers, units or special characters like °C.
-Respond with the HTML only.
-
-{html}
-"""
+LANGUAGES = ("english", "german")
 
 
 def get_api_key() -> str:
@@ -100,44 +125,65 @@ def get_api_key() -> str:
     return api_key
 
 
-def fetch_weather_data() -> dict:
-    response = requests.get(OPEN_METEO_URL, params=OPEN_METEO_PARAMS, timeout=REQUEST_TIMEOUT)
+def fetch_weather_data() -> tuple[bytes, dict]:
+    """Return the forecast response body as received and the parsed data."""
+    response = SESSION.get(OPEN_METEO_URL, params=OPEN_METEO_PARAMS, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()
-    return response.json()
+    return response.content, orjson.loads(response.content)
+
+
+def load_fresh_snapshot() -> dict | None:
+    """Return today's saved forecast if it is younger than SNAPSHOT_TTL."""
+    try:
+        if time.time() - WEATHER_SNAPSHOT_PATH.stat().st_mtime >= SNAPSHOT_TTL:
+            return None
+        with gzip.open(WEATHER_SNAPSHOT_PATH, "rb") as f:
+            data = orjson.loads(f.read())
+        # forecast_days=1: a snapshot from before midnight covers the wrong day
+        if data["hourly"]["time"][0][:10] != datetime.now(LOCAL_TZ).date().isoformat():
+            return None
+    except (OSError, EOFError, orjson.JSONDecodeError, KeyError, IndexError, TypeError):
+        return None
+    return data
 
 
 def summarize_weather(data: dict) -> str:
     """Condense the hourly forecast into a compact text block for the LLM."""
     hourly = data["hourly"]
-    date = hourly["time"][0].split("T")[0]
+    # Open-Meteo times are fixed-width local wall time: "YYYY-MM-DDTHH:MM"
+    date = hourly["time"][0][:10]
+    temps = hourly["temperature_2m"]
+    winds = hourly["wind_speed_10m"]
+    gusts = hourly["wind_gusts_10m"]
+    rain = hourly["precipitation"]
+    rain_probs = hourly["precipitation_probability"]
+    uvs = hourly["uv_index"]
+    codes = hourly["weather_code"]
 
     def avg(values):
         return sum(values) / len(values)
 
     header = (
         f"Forecast for {date} | {data['latitude']}, {data['longitude']} | {data['timezone']}\n"
-        f"Temperature: {min(hourly['temperature_2m'])} to {max(hourly['temperature_2m'])} °C\n"
-        f"Wind: avg {avg(hourly['wind_speed_10m']):.1f} km/h, max {max(hourly['wind_speed_10m'])} km/h, "
-        f"gusts up to {max(hourly['wind_gusts_10m'])} km/h\n"
-        f"Precipitation: total {sum(hourly['precipitation']):.1f} mm, "
-        f"max probability {max(hourly['precipitation_probability'])}%\n"
+        f"Temperature: {min(temps)} to {max(temps)} °C\n"
+        f"Wind: avg {avg(winds):.1f} km/h, max {max(winds)} km/h, gusts up to {max(gusts)} km/h\n"
+        f"Precipitation: total {sum(rain):.1f} mm, max probability {max(rain_probs)}%\n"
         f"Humidity: avg {avg(hourly['relative_humidity_2m']):.0f}%\n"
-        f"UV index: max {max(hourly['uv_index'])}\n"
+        f"UV index: max {max(uvs)}\n"
         f"Sunshine: {sum(hourly['sunshine_duration']) / 3600:.1f} h total\n"
         f"Visibility: avg {avg(hourly['visibility']) / 1000:.1f} km\n"
-        f"WMO weather codes present: {sorted(set(hourly['weather_code']))}\n\n"
+        f"WMO weather codes present: {sorted(set(codes))}\n\n"
         "Hour | Temp °C | Feels °C | Wind km/h | Gusts | UV | Rain % | Rain mm | Cloud % | Code\n"
     )
 
-    lines = []
-    for i, timestamp in enumerate(hourly["time"]):
-        lines.append(
-            f"{timestamp.split('T')[1]} | {hourly['temperature_2m'][i]} | "
-            f"{hourly['apparent_temperature'][i]} | {hourly['wind_speed_10m'][i]} | "
-            f"{hourly['wind_gusts_10m'][i]} | {hourly['uv_index'][i]} | "
-            f"{hourly['precipitation_probability'][i]}% | {hourly['precipitation'][i]} | "
-            f"{hourly['cloud_cover'][i]}% | {hourly['weather_code'][i]}"
+    lines = [
+        f"{timestamp[11:]} | {temp} | {feels} | {wind} | {gust} | {uv} | "
+        f"{rain_prob}% | {rain_mm} | {cloud}% | {code}"
+        for timestamp, temp, feels, wind, gust, uv, rain_prob, rain_mm, cloud, code in zip(
+            hourly["time"], temps, hourly["apparent_temperature"], winds, gusts, uvs,
+            rain_probs, rain, hourly["cloud_cover"], codes,
         )
+    ]
     return header + "\n".join(lines)
 
 
@@ -150,40 +196,103 @@ def strip_code_fences(content: str) -> str:
     return content.strip()
 
 
-def complete(client: Mistral, prompt: str) -> str:
+def create_client(api_key: str) -> Mistral:
+    """Import mistralai only when a completion is needed; it is slow to load."""
+    try:
+        # mistralai >= 2.0 moved the client class
+        from mistralai.client import Mistral
+        from mistralai.client.utils import BackoffStrategy, RetryConfig
+    except ImportError:
+        from mistralai import Mistral
+        from mistralai.utils import BackoffStrategy, RetryConfig
+    # The SDK does not retry unless configured: back off on 429/5xx and
+    # connection errors (honouring Retry-After), giving up after 5 minutes
+    retry_config = RetryConfig("backoff", BackoffStrategy(1_000, 30_000, 2.0, 300_000), True)
+    return Mistral(api_key=api_key, retry_config=retry_config, timeout_ms=MISTRAL_TIMEOUT_MS)
+
+
+def complete(client: Mistral, prompt: str) -> dict[str, str]:
+    """Request the report in JSON mode; return the HTML per language."""
     response = client.chat.complete(
         model=MISTRAL_MODEL,
         messages=[{"role": "user", "content": prompt}],
+        response_format={"type": "json_object"},
+        temperature=MISTRAL_TEMPERATURE,
+        max_tokens=MISTRAL_MAX_TOKENS,
     )
-    return strip_code_fences(response.choices[0].message.content)
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        raise SystemExit(
+            f"Mistral briefing truncated at {MISTRAL_MAX_TOKENS} tokens, raise MISTRAL_MAX_TOKENS"
+        )
+    content = choice.message.content
+    try:
+        report = orjson.loads(strip_code_fences(content or ""))
+    except orjson.JSONDecodeError:
+        report = None
+    if not (
+        isinstance(report, dict)
+        and all(isinstance(report.get(language), str) and report[language].strip()
+                for language in LANGUAGES)
+    ):
+        raise SystemExit(
+            f"Mistral response is not a JSON object with {' and '.join(LANGUAGES)} HTML:\n{content}"
+        )
+    return {language: strip_code_fences(report[language]) for language in LANGUAGES}
+
+
+def prompt_hash(prompt: str) -> str:
+    """Fingerprint of a model + prompt pair, stored with the analysis."""
+    return hashlib.blake2b(f"{MISTRAL_MODEL}\n{prompt}".encode(), digest_size=16).hexdigest()
+
+
+def previous_input_hash() -> str | None:
+    """input_hash of the saved analysis, if any."""
+    try:
+        return orjson.loads(ANALYSIS_PATH.read_bytes()).get("input_hash")
+    except (OSError, orjson.JSONDecodeError, AttributeError):
+        return None
+
+
+def save_snapshot(body: bytes) -> None:
+    """Keep the forecast response gzipped for re-runs within SNAPSHOT_TTL."""
+    WEATHER_SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(WEATHER_SNAPSHOT_PATH, "wb", compresslevel=1) as f:
+        f.write(body)
+    print(f"wrote {WEATHER_SNAPSHOT_PATH}")
 
 
 def save_json(data: dict, path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    path.write_bytes(orjson.dumps(data))
     print(f"wrote {path}")
 
 
 def main() -> int:
-    client = Mistral(api_key=get_api_key())
-
-    print("Fetching weather data...")
-    weather_data = fetch_weather_data()
-    save_json(weather_data, WEATHER_SNAPSHOT_PATH)
-
+    weather_data = load_fresh_snapshot()
+    if weather_data is not None:
+        print(f"Reusing weather data from {WEATHER_SNAPSHOT_PATH}")
+    else:
+        print("Fetching weather data...")
+        body, weather_data = fetch_weather_data()
+        save_snapshot(body)
+
+    prompt = ANALYSIS_PROMPT.format(weather_summary=summarize_weather(weather_data))
+    input_hash = prompt_hash(prompt)
+    if input_hash == previous_input_hash():
+        print(f"Forecast unchanged since the analysis in {ANALYSIS_PATH}, keeping it")
+        return 0
+
+    client = create_client(get_api_key())
     print("Generating analysis...")
-    english = complete(client, ANALYSIS_PROMPT.format(weather_summary=summarize_weather(weather_data)))
-
-    print("Translating to German...")
-    german = complete(client, TRANSLATION_PROMPT.format(html=english))
+    report = complete(client, prompt)
 
     save_json(
         {
             "timestamp": datetime.now(LOCAL_TZ).isoformat(),
             "model": MISTRAL_MODEL,
-            "english": english,
-            "german": german,
+            "input_hash": input_hash,
+            **report,
         },
         ANALYSIS_PATH,
     )
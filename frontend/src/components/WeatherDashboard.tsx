@@ -13,9 +13,10 @@ import {
   Sunset,
   Wind,
 } from 'lucide-react';
-import type { GeosphereData, Language, WeatherData } from '@/lib/types';
+import type { GeosphereData, Language, WeatherData, WeatherDataFile } from '@/lib/types';
 import { translations } from '@/lib/i18n';
 import { dataUrl } from '@/lib/data-url';
+import { isColumnsOrEntries, toEntries } from '@/lib/columns';
 import {
   formatDay,
   formatNumber,
@@ -39,15 +40,15 @@ import NowcastPanels from './charts/NowcastPanels';
 
 // Shape guards: the data files in the repo (and in caches along the way) can
 // lag behind the frontend, so never assume a fetched payload matches types.ts.
-function isWeatherData(json: unknown): json is WeatherData {
-  const d = json as WeatherData | null;
+function isWeatherData(json: unknown): json is WeatherDataFile {
+  const d = json as WeatherDataFile | null;
   return (
     !!d &&
     typeof d === 'object' &&
     !!d.current &&
     typeof d.current === 'object' &&
-    Array.isArray(d.hourly) &&
-    Array.isArray(d.daily)
+    isColumnsOrEntries(d.hourly) &&
+    isColumnsOrEntries(d.daily)
   );
 }
 
@@ -79,7 +80,7 @@ const WeatherDashboard: React.FC = () => {
           if (!res.ok) continue;
           const json = await res.json();
           if (isWeatherData(json)) {
-            setWeather(json);
+            setWeather({ ...json, hourly: toEntries(json.hourly), daily: toEntries(json.daily) });
             return;
           }
         } catch {
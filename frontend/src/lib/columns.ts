@@ -0,0 +1,23 @@
+import type { Columns } from './types';
+
+// The forecast data files keep hourly/daily blocks column-oriented (one array
+// per field, as Open-Meteo delivers them) to stay small on the wire. The
+// components work on entry objects, so zip the columns once after loading.
+
+/** Either the column-oriented form or an entry array (older data files). */
+export function isColumnsOrEntries(json: unknown): boolean {
+  if (Array.isArray(json)) return true;
+  const d = json as { time?: unknown } | null;
+  return !!d && typeof d === 'object' && Array.isArray(d.time);
+}
+
+/** Zip columns into one entry per timestamp; entry arrays pass through. */
+export function toEntries<T extends { time: string }>(data: Columns<T> | T[]): T[] {
+  if (Array.isArray(data)) return data;
+  const keys = Object.keys(data) as (keyof T)[];
+  return data.time.map((_, i) => {
+    const entry = {} as T;
+    for (const key of keys) entry[key] = data[key][i];
+    return entry;
+  });
+}
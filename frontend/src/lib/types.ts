@@ -70,6 +70,18 @@ export interface WeatherData {
   daily: DailyEntry[];
 }
 
+/** Column-oriented form of a list of entries: one array per field. */
+export type Columns<T> = { [K in keyof T]: T[K][] };
+
+/**
+ * processed_open_meteo.json as shipped: hourly and daily are column-oriented
+ * (older files used entry arrays).
+ */
+export interface WeatherDataFile extends Omit<WeatherData, 'hourly' | 'daily'> {
+  hourly: Columns<HourlyEntry> | HourlyEntry[];
+  daily: Columns<DailyEntry> | DailyEntry[];
+}
+
 export interface NowcastEntry {
   time: string; // ISO instant with offset (UTC)
   temperature: number | null;
@@ -93,6 +105,7 @@ export interface GeosphereData {
 export interface WeatherAnalysis {
   timestamp: string;
   model?: string;
+  input_hash?: string; // fingerprint of the prompt, lets the backend skip unchanged reruns
   english?: string;
   german?: string;
   analysis?: string; // legacy single-language field